@@ -1,14 +1,48 @@
 from openpyxl import load_workbook
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union, BinaryIO, Iterator
 from pathlib import Path
+import hashlib
 import io
 from datetime import datetime
+from sheet_profile import ColumnCollector, profile_sheet, PROFILE_ROW_THRESHOLD
+
+# 업로드 파일 해시 및 시트 XML 탐색 시 사용하는 청크 크기
+CHUNK_SIZE = 1024 * 1024
+MERGE_CELLS_TAG = b'mergeCells'
+
+ExcelSource = Union[bytes, str, Path, BinaryIO]
+
+def _iter_chunks(uploaded_file: BinaryIO) -> Iterator[memoryview]:
+    """업로드 파일 버퍼를 복사 없이 청크 단위로 반환"""
+    if hasattr(uploaded_file, 'getbuffer'):
+        with uploaded_file.getbuffer() as buffer:
+            for offset in range(0, len(buffer), CHUNK_SIZE):
+                yield buffer[offset:offset + CHUNK_SIZE]
+    else:
+        uploaded_file.seek(0)
+        while True:
+            chunk = uploaded_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield memoryview(chunk)
+
+def hash_uploaded_file(uploaded_file: BinaryIO) -> str:
+    """업로드 파일 내용의 SHA-256 해시 계산 (버퍼 복사 없음)"""
+    hasher = hashlib.sha256()
+    for chunk in _iter_chunks(uploaded_file):
+        hasher.update(chunk)
+    return hasher.hexdigest()
 
 class ExcelDocumentParser:
-    def __init__(self, file_content: bytes, file_name: str = ""):
-        """Excel 문서 파서 초기화"""
-        self.wb = load_workbook(io.BytesIO(file_content), data_only=True)
+    def __init__(self, file_content: ExcelSource, file_name: str = ""):
+        """Excel 문서 파서 초기화 (bytes, 파일 경로 또는 파일 핸들)
+
+        read_only 모드로 열어 셀을 스트리밍으로 읽으므로 파싱이 끝날 때까지 원본을 열어 두어야 한다.
+        """
+        if isinstance(file_content, (bytes, bytearray)):
+            file_content = io.BytesIO(file_content)
+        self.wb = load_workbook(file_content, read_only=True, data_only=True)
         
         # 보이는 시트만 필터링
         self.visible_sheets = []
@@ -26,7 +60,8 @@ class ExcelDocumentParser:
                 'sheets_info': {},
                 'last_modified': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             },
-            'sheets': {}
+            'sheets': {},
+            'sheet_profiles': {}
         }
 
     def _get_sheet_info(self, sheet) -> Dict:
@@ -34,10 +69,22 @@ class ExcelDocumentParser:
         return {
             'max_row': sheet.max_row,
             'max_column': sheet.max_column,
-            'has_merged_cells': bool(sheet.merged_cells),
+            'has_merged_cells': self._has_merged_cells(sheet),
             'sheet_state': sheet.sheet_state  # 시트 상태 추가
         }
 
+    def _has_merged_cells(self, sheet) -> bool:
+        """병합 셀 여부 확인 (read_only 시트는 병합 정보를 제공하지 않아 시트 XML에서 직접 탐색)"""
+        tail = b''
+        with sheet._get_source() as source:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    return False
+                if MERGE_CELLS_TAG in chunk or MERGE_CELLS_TAG in tail + chunk[:len(MERGE_CELLS_TAG)]:
+                    return True
+                tail = chunk[-len(MERGE_CELLS_TAG):]
+
     def _get_cell_value(self, cell: Any) -> Optional[Any]:
         """셀 값을 적절한 형태로 반환"""
         if cell.value is None:
@@ -51,8 +98,8 @@ class ExcelDocumentParser:
         except:
             return str(value)
 
-    def parse_sheet(self, sheet) -> Dict:
-        """시트 내용 파싱"""
+    def parse_sheet(self, sheet, columns: Optional[ColumnCollector] = None) -> Dict:
+        """시트 내용 파싱 (columns가 주어지면 통계 프로파일용 열 단위 데이터도 함께 수집)"""
         sheet_content = []
         current_row_index = 0
 
@@ -68,8 +115,12 @@ class ExcelDocumentParser:
                         'value': value,
                         'coordinate': cell.coordinate
                     }
+                    if columns is not None:
+                        columns.add_cell(cell.column_letter, len(sheet_content), value)
             
             if has_value:  # 값이 있는 행만 추가
+                if columns is not None:
+                    columns.add_row(current_row_index + 1)
                 sheet_content.append({
                     'row_index': current_row_index,
                     'content': row_content
@@ -87,14 +138,23 @@ class ExcelDocumentParser:
             # 시트 정보 저장
             self.document_structure['metadata']['sheets_info'][sheet_name] = self._get_sheet_info(sheet)
             
-            # 시트 내용 파싱
-            sheet_content = self.parse_sheet(sheet)
+            # 시트 내용 파싱 (기준 행 수를 넘을 수 있는 시트만 열 단위 데이터 수집)
+            columns = None
+            if sheet.max_row is None or sheet.max_row > PROFILE_ROW_THRESHOLD:
+                columns = ColumnCollector()
+            sheet_content = self.parse_sheet(sheet, columns)
             if sheet_content:  # 내용이 있는 시트만 추가
                 self.document_structure['sheets'][sheet_name] = sheet_content
+            
+            # 대용량 시트는 수집한 열 데이터로 바로 프로파일을 만들고 열 데이터는 버림
+            if columns is not None and len(sheet_content) > PROFILE_ROW_THRESHOLD:
+                self.document_structure['sheet_profiles'][sheet_name] = profile_sheet(sheet_content, columns)
 
+        # read_only 모드에서 열어 둔 원본 파일 닫기
+        self.wb.close()
         return self.document_structure
 
-def process_excel_content(file_content: bytes, file_name: str = "") -> Dict:
+def process_excel_content(file_content: ExcelSource, file_name: str = "") -> Dict:
     """Excel 문서를 처리하고 구조화된 형태로 반환"""
     try:
         parser = ExcelDocumentParser(file_content, file_name)
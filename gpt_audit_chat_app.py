@@ -1,6 +1,8 @@
 import streamlit as st
-from excel import process_excel_content
-from gpt_aura_reviewer import ExcelDocumentQA
+from excel import process_excel_content, hash_uploaded_file
+from gpt_aura_reviewer import ExcelDocumentQA, PROFILED_SHEET_GUIDE
+from workpaper_versions import WorkpaperVersionTracker
+from sheet_profile import compact_document, has_profiled_data
 import json
 import time
 from PIL import Image
@@ -15,9 +17,19 @@ class AuditReviewChatbot:
         """감사조서 리뷰 챗봇 초기화"""
         self.qa_engine = ExcelDocumentQA()
         
-    def process_excel_to_json(self, file_content: bytes, file_name: str) -> dict:
-        """엑셀 파일을 JSON 구조로 변환"""
-        return process_excel_content(file_content, file_name)
+    def process_excel_to_json(self, uploaded_file, file_name: str) -> dict:
+        """엑셀 파일을 JSON 구조로 변환 (업로드 버퍼를 복사 없이 파서에 전달)"""
+        uploaded_file.seek(0)
+        return process_excel_content(uploaded_file, file_name)
+
+    def get_review_question(self, review_data: dict) -> str:
+        """검토 요청 질문 생성 (수정본은 변경분과 이전 검토 의견 반영 여부 중심)"""
+        file_name = review_data['metadata']['file_name']
+        if 'revision' in review_data:
+            return (f"'{file_name}' 수정본(v{review_data['revision']['version']})을 재검토해주세요. "
+                    "이전 검토 의견(prior_findings)이 변경 내용에 적절히 반영되었는지 확인하고, "
+                    "변경된 행에서 새로 발견된 사항을 제시해주세요.")
+        return (f"'{file_name}' 감사조서를 검토하고 주요 발견사항과 검토 의견을 제시해주세요.")
             
     def get_response_stream(self, json_data_list: list, question: str):
         """스트리밍 방식으로 응답 생성"""
@@ -59,6 +71,34 @@ def initialize_session_state():
         st.session_state.processing = False
     if 'uploaded_files' not in st.session_state:
         st.session_state.uploaded_files = set()
+    if 'version_tracker' not in st.session_state:
+        st.session_state.version_tracker = WorkpaperVersionTracker()
+    if 'review_keys' not in st.session_state:
+        st.session_state.review_keys = []
+    if 'upload_hashes' not in st.session_state:
+        st.session_state.upload_hashes = {}
+    if 'upload_engagements' not in st.session_state:
+        st.session_state.upload_engagements = {}
+    if 'pending_review' not in st.session_state:
+        st.session_state.pending_review = None
+
+def render_response_stream(response_stream) -> str:
+    """스트리밍 응답을 화면에 표시하고 전체 응답 반환"""
+    response_container = st.empty()
+    full_response = ""
+    
+    for chunk in response_stream:
+        if chunk.choices[0].delta.content is not None:
+            content = chunk.choices[0].delta.content
+            full_response += content
+            # \n을 <br>로 변환하여 표시
+            display_response = full_response.replace('\\n', '<br>')
+            response_container.markdown(display_response + "▌", unsafe_allow_html=True)
+    
+    # 최종 응답 표시
+    final_response = full_response.replace('\\n', '<br>')
+    response_container.markdown(final_response, unsafe_allow_html=True)
+    return full_response
 
 def convert_markdown_table_to_df(markdown_text):
     """마크다운 테이블을 DataFrame으로 변환"""
@@ -180,8 +220,8 @@ def main():
                 with st.spinner("체크리스트 검토 중..."):
                     try:
                         # 파일 처리
-                        file_content = checker_file.read()
-                        json_data = chatbot.process_excel_to_json(file_content, checker_file.name)
+                        json_data = chatbot.process_excel_to_json(checker_file, checker_file.name)
+                        checker_data = compact_document(json_data)
                         
                         # 프롬프트 수정
                         prompt = f"""
@@ -224,7 +264,7 @@ def main():
                            - O: 해당 절차가 적절히 수행되고 문서화된 경우
                            - X: 절차가 미흡하거나 문서화가 불충분한 경우
 
-                        체크리스트 데이터: {json_data}
+                        체크리스트 데이터: {checker_data}
                         """
                         
                         messages = [
@@ -237,6 +277,7 @@ def main():
                                 3. 절차의 적정성과 문서화 수준을 판단
                                 4. 발견된 미비점과 개선사항을 명확히 제시
                                 표 형식이 깨지지 않도록 주의하며, 비고란은 상세하고 전문적으로 작성하세요."""
+                                + ("\n\n" + PROFILED_SHEET_GUIDE if has_profiled_data(checker_data) else "")
                             },
                             {"role": "user", "content": prompt}
                         ]
@@ -352,13 +393,25 @@ def main():
                 help="여러 개의 파일을 동시에 업로드할 수 있습니다. (최대 200MB/파일)"
             )
             
+            # Aura URL을 engagement 식별자로 사용하여 버전 관리
+            current_engagement = aura_url.strip() or "default"
+            tracker = st.session_state.version_tracker
+            
             # 업로드된 파일 처리
             if uploaded_files:
                 for uploaded_file in uploaded_files:
                     file_name = uploaded_file.name
                     
-                    # 새로운 파일만 처리
-                    if file_name not in st.session_state.uploaded_files:
+                    # 해시는 업로드(file_id)당 한 번만 계산
+                    if uploaded_file.file_id not in st.session_state.upload_hashes:
+                        st.session_state.upload_hashes[uploaded_file.file_id] = hash_uploaded_file(uploaded_file)
+                    content_hash = st.session_state.upload_hashes[uploaded_file.file_id]
+                    
+                    # engagement는 업로드(file_id) 시점의 Aura URL로 고정
+                    engagement = st.session_state.upload_engagements.setdefault(uploaded_file.file_id, current_engagement)
+                    
+                    # 새로운 파일 또는 새로운 버전만 처리
+                    if not tracker.has_content(engagement, file_name, content_hash):
                         try:
                             st.session_state.processing = True
                             
@@ -370,13 +423,29 @@ def main():
                             
                             # 파일 처리
                             with st.spinner(f"'{file_name}' 처리 중..."):
-                                file_content = uploaded_file.read()
-                                json_data = chatbot.process_excel_to_json(file_content, file_name)
+                                json_data = chatbot.process_excel_to_json(uploaded_file, file_name)
                                 
                                 if json_data:
-                                    st.session_state.json_data_list.append(json_data)
+                                    version = tracker.register(engagement, file_name, content_hash, json_data)
+                                    review_key = (engagement, file_name)
+                                    if review_key in st.session_state.review_keys:
+                                        idx = st.session_state.review_keys.index(review_key)
+                                        st.session_state.json_data_list[idx] = json_data
+                                    else:
+                                        st.session_state.review_keys.append(review_key)
+                                        st.session_state.json_data_list.append(json_data)
                                     st.session_state.uploaded_files.add(file_name)
-                                    st.success(f"✅ '{file_name}' 분석 완료!")
+                                    
+                                    if version['diff'] is None:
+                                        st.success(f"✅ '{file_name}' 분석 완료!")
+                                    else:
+                                        diff = version['diff']
+                                        st.success(
+                                            f"✅ '{file_name}' v{version['version']} 분석 완료! "
+                                            f"(변경 시트 {len(diff['changed_sheets']) + len(diff['added_sheets'])}개, "
+                                            f"순서만 변경 {len(diff['reordered_sheets'])}개, "
+                                            f"변경 없음 {len(diff['unchanged_sheets'])}개)"
+                                        )
                         
                         except Exception as e:
                             st.error(f"'{file_name}' 처리 중 오류 발생: {str(e)}")
@@ -390,10 +459,23 @@ def main():
                 for idx, file_name in enumerate(st.session_state.uploaded_files, 1):
                     st.write(f"{idx}. {file_name}")
                 
+                # 검토 의견은 명시적인 검토 요청의 응답만 버전별로 저장
+                st.write("### 감사조서 검토")
+                for engagement, file_name in st.session_state.review_keys:
+                    latest = st.session_state.version_tracker.get_latest(engagement, file_name)
+                    label = "재검토" if latest['diff'] else "검토"
+                    if st.button(f"📝 {file_name} v{latest['version']} {label}", key=f"review_{engagement}_{file_name}"):
+                        st.session_state.pending_review = (engagement, file_name)
+                
                 if st.button("모든 파일 초기화"):
                     st.session_state.messages = []
                     st.session_state.json_data_list = []
                     st.session_state.uploaded_files = set()
+                    st.session_state.version_tracker = WorkpaperVersionTracker()
+                    st.session_state.review_keys = []
+                    st.session_state.upload_hashes = {}
+                    st.session_state.upload_engagements = {}
+                    st.session_state.pending_review = None
                     st.session_state.processing = False
                     st.rerun()
 
@@ -406,29 +488,42 @@ def main():
                 content = message["content"].replace('\\n', '<br>')
                 st.markdown(content, unsafe_allow_html=True)
         
+        # 검토 요청 (수정본은 변경분과 이전 검토 의견만 전달)
+        if st.session_state.pending_review:
+            engagement, file_name = st.session_state.pending_review
+            st.session_state.pending_review = None
+            review_data = st.session_state.version_tracker.build_review_payload(engagement, file_name)
+            question = chatbot.get_review_question(review_data)
+            
+            st.session_state.messages.append({"role": "user", "content": question})
+            with st.chat_message("user"):
+                st.markdown(question)
+            
+            with st.chat_message("assistant"):
+                try:
+                    full_response = render_response_stream(
+                        chatbot.get_response_stream([compact_document(review_data)], question)
+                    )
+                    st.session_state.messages.append({"role": "assistant", "content": full_response})
+                    
+                    # 다음 수정본 재검토 시 활용할 검토 의견 저장
+                    st.session_state.version_tracker.record_findings(engagement, file_name, full_response)
+                    
+                except Exception as e:
+                    st.error(f"검토 중 오류가 발생했습니다: {str(e)}")
+        
         # 사용자 입력
         if prompt := st.chat_input("질문을 입력하세요"):
             st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user"):
                 st.markdown(prompt)
             
-            # 어시스턴트 응답
+            # 어시스턴트 응답 (일반 질문은 최신 버전 전체 문서 기준)
             with st.chat_message("assistant"):
-                response_container = st.empty()
-                full_response = ""
-                
                 try:
-                    for chunk in chatbot.get_response_stream(st.session_state.json_data_list, prompt):
-                        if chunk.choices[0].delta.content is not None:
-                            content = chunk.choices[0].delta.content
-                            full_response += content
-                            # \n을 <br>로 변환하여 표시
-                            display_response = full_response.replace('\\n', '<br>')
-                            response_container.markdown(display_response + "▌", unsafe_allow_html=True)
-                    
-                    # 최종 응답 표시
-                    final_response = full_response.replace('\\n', '<br>')
-                    response_container.markdown(final_response, unsafe_allow_html=True)
+                    full_response = render_response_stream(chatbot.get_response_stream(
+                        [compact_document(json_data) for json_data in st.session_state.json_data_list], prompt
+                    ))
                     st.session_state.messages.append({"role": "assistant", "content": full_response})
                     
                 except Exception as e:
@@ -4,12 +4,21 @@ import json
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import os
+from sheet_profile import has_profiled_data
 
 # from dotenv import load_dotenv
 # load_dotenv()
 # openai_api_key = os.getenv("API_KEY")
 openai_api_key = st.secrets["API_KEY"]
 
+# 대용량 시트가 통계 프로파일로 대체된 경우 프롬프트에 추가하는 안내
+PROFILED_SHEET_GUIDE = """대용량 시트 안내:
+- 행 수가 많은 시트(또는 수정본의 변경/삭제 행)는 원본 행 대신 프로파일(profiled: true)로 제공됩니다.
+- 프로파일은 헤더(header_row), 열별 통계(columns: 건수, 합계, 최소/최대, 고유값 수, 최빈값, 이상치, 공란 비율)와 표본 행(sample_rows)으로 구성됩니다.
+- 합계와 이상치 등 통계 수치를 근거로 검토하고, 개별 행 확인이 필요한 경우 해당 셀 좌표를 명시해주세요.
+
+"""
+
 class ExcelDocumentQA:
     def __init__(self):
         """OpenAI 클라이언트 초기화"""
@@ -43,6 +52,23 @@ class ExcelDocumentQA:
 {files_info}
 
 """
+            # 수정본이 포함된 경우 변경 영역 중심 검토 안내
+            revised_files = [
+                file_data['metadata']['file_name']
+                for file_data in json_data['files_data']
+                if 'revision' in file_data
+            ]
+            if revised_files:
+                system_prompt += f"""수정본 재검토 대상 파일: {', '.join(revised_files)}
+- 해당 파일은 이전 버전 대비 변경된 행(changed_rows), 삭제된 행(removed_rows)과 시트 헤더 행(header_row), 이전 검토 의견(prior_findings)만 제공됩니다.
+- 행 순서만 바뀌고 내용은 같은 시트는 reordered_sheets에 표시됩니다.
+- 변경되지 않은 시트(unchanged_sheets)는 이전 검토 결과가 유효한 것으로 보고, 이전 검토 의견이 적절히 반영되었는지 중점적으로 검토해주세요.
+
+"""
+
+            # 대용량 시트가 통계 프로파일로 대체된 경우 안내
+            if any(has_profiled_data(file_data) for file_data in json_data['files_data']):
+                system_prompt += PROFILED_SHEET_GUIDE
         else:
             # 단일 파일인 경우
             metadata = json_data['metadata']
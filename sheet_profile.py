@@ -0,0 +1,260 @@
+from array import array
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 이 행 수를 초과하는 시트는 원본 행 대신 통계 프로파일과 표본 행을 전달
+PROFILE_ROW_THRESHOLD = 500
+# 프롬프트에 포함할 표본 행 수
+SAMPLE_ROW_COUNT = 20
+# 헤더 행을 탐색할 상단 행 수
+HEADER_SCAN_ROWS = 20
+TOP_VALUE_COUNT = 5
+OUTLIER_EXAMPLE_COUNT = 5
+# 숫자/날짜 열로 판정하기 위한 최소 비율
+TYPE_RATIO_THRESHOLD = 0.9
+
+
+def detect_header_row(sheet_content: List[Dict]) -> Optional[int]:
+    """상단 행 중 문자열로만 구성된 가장 넓은 행을 헤더로 판정 (sheet_content 내 위치 반환)"""
+    candidates = sheet_content[:HEADER_SCAN_ROWS]
+    if not candidates:
+        return None
+
+    max_width = max(len(row['content']) for row in candidates)
+    header_pos = None
+    header_width = 0
+    for pos, row in enumerate(candidates):
+        values = [cell['value'] for cell in row['content'].values()]
+        width = len(values)
+        if width < 2 or width < max_width * 0.5:
+            continue
+        if all(isinstance(value, str) for value in values) and width > header_width:
+            header_pos = pos
+            header_width = width
+
+    return header_pos
+
+
+class ColumnCollector:
+    def __init__(self):
+        """열 단위 데이터 수집기 (숫자 셀은 typed array, 그 외 셀은 리스트로 보관)"""
+        self.row_numbers = array('q')
+        # 열 문자 -> (숫자 위치, 숫자 값, 기타 위치, 기타 값), 위치는 sheet_content 내 행 위치
+        self.columns: Dict[str, Tuple[array, array, array, List[Any]]] = {}
+
+    def add_row(self, row_number: int) -> None:
+        """값이 있는 행의 엑셀 행 번호 기록"""
+        self.row_numbers.append(row_number)
+
+    def add_cell(self, col: str, pos: int, value: Any) -> None:
+        """셀 값 기록 (bool은 숫자로 보지 않음)"""
+        column = self.columns.get(col)
+        if column is None:
+            column = self.columns[col] = (array('q'), array('d'), array('q'), [])
+        value_type = type(value)
+        if value_type is int or value_type is float:
+            column[0].append(pos)
+            column[1].append(value)
+        else:
+            column[2].append(pos)
+            column[3].append(value)
+
+
+def collect_columns(sheet_content: List[Dict]) -> ColumnCollector:
+    """행 단위 파싱 결과로부터 열 단위 데이터 수집 (파싱 시 수집한 데이터가 없을 때 사용)"""
+    collector = ColumnCollector()
+    for pos, row in enumerate(sheet_content):
+        collector.add_row(row['row_index'] + 1)
+        for col, cell in row['content'].items():
+            collector.add_cell(col, pos, cell['value'])
+    return collector
+
+
+def _slice_column(column: Tuple[array, array, array, List[Any]], offset: int) -> Tuple[np.ndarray, np.ndarray, List[Any]]:
+    """헤더 이후 데이터 행의 (숫자 위치, 숫자 값, 기타 값) 반환 (위치는 데이터 행 기준)
+
+    위치는 오름차순으로 수집되므로 헤더 이전 값은 searchsorted로 잘라낸다.
+    """
+    number_positions = np.frombuffer(column[0], dtype=np.int64)
+    number_start = np.searchsorted(number_positions, offset)
+    other_start = np.searchsorted(np.frombuffer(column[2], dtype=np.int64), offset)
+    return (number_positions[number_start:] - offset,
+            np.frombuffer(column[1], dtype=np.float64)[number_start:],
+            column[3][other_start:] if other_start else column[3])
+
+
+def _to_python(value: Any) -> Any:
+    """numpy 스칼라를 JSON 직렬화 가능한 값으로 변환 (정수값 실수는 정수로)"""
+    value = value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _top_values(values: np.ndarray, counts: np.ndarray) -> List[Dict]:
+    """최빈값 목록 (모든 값이 고유한 열은 생략)"""
+    if len(counts) == 0 or counts.max() == 1:
+        return []
+    order = np.argsort(-counts, kind='stable')[:TOP_VALUE_COUNT]
+    return [{'value': _to_python(values[idx]), 'count': int(counts[idx])} for idx in order]
+
+
+def _number_summary(col: str, numbers: np.ndarray, positions: np.ndarray, row_numbers: np.ndarray) -> Dict:
+    """숫자 열 요약 (합계, 최소/최대, 평균, IQR 기준 이상치)"""
+    q1, median, q3 = np.percentile(numbers, [25, 50, 75])
+    iqr = q3 - q1
+    outlier_index = np.flatnonzero((numbers < q1 - 1.5 * iqr) | (numbers > q3 + 1.5 * iqr))
+    deviation = np.abs(numbers[outlier_index] - median)
+    examples = [
+        {'coordinate': f"{col}{row_numbers[positions[idx]]}", 'value': _to_python(numbers[idx])}
+        for idx in outlier_index[np.argsort(-deviation)[:OUTLIER_EXAMPLE_COUNT]]
+    ]
+
+    return {
+        'sum': _to_python(numbers.sum()),
+        'min': _to_python(numbers.min()),
+        'max': _to_python(numbers.max()),
+        'mean': round(numbers.mean().item(), 2),
+        'outlier_count': len(outlier_index),
+        'outlier_examples': examples
+    }
+
+
+def profile_column(col: str, name: Any, number_positions: np.ndarray, numbers: np.ndarray,
+                   others: List[Any], row_count: int, row_numbers: np.ndarray) -> Dict:
+    """열의 유형 판정 및 통계 요약 (값이 있는 셀만 전달, 위치는 데이터 행 기준)"""
+    count = len(numbers) + len(others)
+    profile = {
+        'column': col,
+        'name': name,
+        'type': 'empty',
+        'count': count,
+        'blank_rate': round(1 - count / row_count, 4) if row_count else 1.0,
+        'distinct': 0,
+        'top_values': []
+    }
+    if count == 0:
+        return profile
+
+    if len(numbers) >= count * TYPE_RATIO_THRESHOLD:
+        distinct_values, counts = np.unique(numbers, return_counts=True)
+        profile['distinct'] = len(distinct_values)
+        profile['top_values'] = _top_values(distinct_values, counts)
+        profile['type'] = 'number'
+        profile.update(_number_summary(col, numbers, number_positions, row_numbers))
+        return profile
+
+    value_counts = Counter(others)
+    if len(numbers):
+        value_counts.update(numbers.tolist())
+    distinct_values = np.empty(len(value_counts), dtype=object)
+    distinct_values[:] = list(value_counts)
+    counts = np.fromiter(value_counts.values(), dtype=np.int64, count=len(value_counts))
+    profile['distinct'] = len(distinct_values)
+    profile['top_values'] = _top_values(distinct_values, counts)
+
+    # 날짜 판정은 문자열로만 구성된 열의 고유값에 대해서만 수행
+    if len(numbers) == 0 and pd.api.types.infer_dtype(distinct_values, skipna=False) == 'string':
+        dates = pd.to_datetime(pd.Series(distinct_values, dtype=object), format='%Y-%m-%d', errors='coerce')
+        valid = dates.notna().to_numpy()
+        if counts[valid].sum() >= count * TYPE_RATIO_THRESHOLD:
+            profile['type'] = 'date'
+            profile['min'] = dates[valid].min().strftime('%Y-%m-%d')
+            profile['max'] = dates[valid].max().strftime('%Y-%m-%d')
+            return profile
+
+    profile['type'] = 'text'
+    return profile
+
+
+def _sample_positions(row_count: int) -> List[int]:
+    """처음과 끝을 포함해 균등 간격으로 표본 위치 선택"""
+    if row_count <= SAMPLE_ROW_COUNT:
+        return list(range(row_count))
+    return sorted(set(np.linspace(0, row_count - 1, SAMPLE_ROW_COUNT).astype(int).tolist()))
+
+
+def profile_sheet(sheet_content: List[Dict], column_data: Optional[ColumnCollector] = None,
+                  header_row: Optional[Dict] = None, detect_header: bool = True) -> Dict:
+    """parse_sheet 결과로부터 헤더, 열별 통계 프로파일, 표본 행 생성
+
+    detect_header가 False이면 주어진 header_row를 사용하고 모든 행을 데이터 행으로 본다 (변경 행 목록 등).
+    """
+    if column_data is None:
+        column_data = collect_columns(sheet_content)
+
+    if not detect_header:
+        offset = 0
+    else:
+        header_pos = detect_header_row(sheet_content)
+        header_row = sheet_content[header_pos] if header_pos is not None else None
+        offset = header_pos + 1 if header_pos is not None else 0
+    data_rows = sheet_content[offset:]
+
+    header_names = {}
+    if header_row:
+        header_names = {col: cell['value'] for col, cell in header_row['content'].items()}
+
+    row_numbers = np.frombuffer(column_data.row_numbers, dtype=np.int64)[offset:]
+    columns = {col: _slice_column(column, offset) for col, column in column_data.columns.items()}
+
+    return {
+        'profiled': True,
+        'total_rows': len(sheet_content),
+        'data_rows': len(data_rows),
+        'header_row': header_row,
+        'columns': [
+            profile_column(col, header_names.get(col), *columns[col], len(data_rows), row_numbers)
+            for col in sorted(columns, key=lambda letter: (len(letter), letter))
+        ],
+        'sample_rows': [data_rows[pos] for pos in _sample_positions(len(data_rows))]
+    }
+
+
+def profile_document(json_data: Dict) -> Dict[str, Dict]:
+    """행 수가 기준을 초과하는 시트의 프로파일 생성"""
+    return {
+        sheet_name: profile_sheet(sheet_content)
+        for sheet_name, sheet_content in json_data.get('sheets', {}).items()
+        if len(sheet_content) > PROFILE_ROW_THRESHOLD
+    }
+
+
+def compact_rows(rows: List[Dict], header_row: Optional[Dict] = None) -> Any:
+    """행 목록이 기준을 초과하면 원본 시트의 헤더를 기준으로 프로파일로 대체"""
+    if len(rows) <= PROFILE_ROW_THRESHOLD:
+        return rows
+    return profile_sheet(rows, header_row=header_row, detect_header=False)
+
+
+def _is_profiled(data: Any) -> bool:
+    return isinstance(data, dict) and data.get('profiled', False)
+
+
+def has_profiled_data(json_data: Dict) -> bool:
+    """프롬프트용 문서에 프로파일로 대체된 시트나 변경 행이 있는지 확인"""
+    if any(_is_profiled(sheet) for sheet in json_data.get('sheets', {}).values()):
+        return True
+    changed_sheets = json_data.get('revision', {}).get('changed_sheets', {})
+    return any(
+        _is_profiled(sheet_diff['changed_rows']) or _is_profiled(sheet_diff['removed_rows'])
+        for sheet_diff in changed_sheets.values()
+    )
+
+
+def compact_document(json_data: Dict) -> Dict:
+    """프롬프트용 문서 구성 (대용량 시트는 프로파일과 표본 행으로 대체)"""
+    profiles = json_data.get('sheet_profiles')
+    if profiles is None:
+        profiles = profile_document(json_data)
+
+    compacted = {key: value for key, value in json_data.items() if key != 'sheet_profiles'}
+    if 'sheets' in json_data:
+        compacted['sheets'] = {
+            sheet_name: profiles.get(sheet_name, sheet_content)
+            for sheet_name, sheet_content in json_data['sheets'].items()
+        }
+    return compacted
@@ -0,0 +1,205 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from sheet_profile import compact_rows, detect_header_row
+
+# 버전별로 보관하는 검토 의견의 최대 길이
+MAX_FINDING_CHARS = 2000
+
+
+def _hash_row(row: Dict) -> str:
+    """행 내용 해시 (셀 좌표 제외, 열 문자와 값 기준)"""
+    values = {col: cell['value'] for col, cell in row['content'].items()}
+    payload = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def compute_sheet_digest(sheet_content: List[Dict]) -> Dict:
+    """시트의 행별 해시와 시트 전체 해시 계산
+
+    행 해시는 위치와 무관하게 내용만 비교하지만, 시트 해시는 행 위치(row_index)를
+    포함하므로 행이 이동만 한 시트도 변경으로 판정된다.
+    """
+    row_hashes = [_hash_row(row) for row in sheet_content]
+    positioned = ''.join(f"{row['row_index']}:{row_hash}" for row, row_hash in zip(sheet_content, row_hashes))
+    sheet_hash = hashlib.sha1(positioned.encode('ascii')).hexdigest()
+    return {
+        'sheet_hash': sheet_hash,
+        'row_hashes': row_hashes
+    }
+
+
+def compute_document_digests(json_data: Dict) -> Dict[str, Dict]:
+    """문서 전체 시트의 해시 계산"""
+    return {
+        sheet_name: compute_sheet_digest(sheet_content)
+        for sheet_name, sheet_content in json_data['sheets'].items()
+    }
+
+
+def diff_sheet(previous_content: List[Dict], previous_digest: Dict,
+               current_content: List[Dict], current_digest: Dict) -> Dict:
+    """이전 버전 대비 시트의 추가/변경 행과 삭제 행 계산
+
+    행 삽입으로 위치만 이동한 행은 내용 해시가 같으므로 변경으로 보지 않는다.
+    """
+    previous_counts: Dict[str, int] = {}
+    for row_hash in previous_digest['row_hashes']:
+        previous_counts[row_hash] = previous_counts.get(row_hash, 0) + 1
+
+    changed_rows = []
+    for row, row_hash in zip(current_content, current_digest['row_hashes']):
+        if previous_counts.get(row_hash, 0) > 0:
+            previous_counts[row_hash] -= 1
+        else:
+            changed_rows.append(row)
+
+    removed_rows = []
+    for row, row_hash in zip(previous_content, previous_digest['row_hashes']):
+        if previous_counts.get(row_hash, 0) > 0:
+            previous_counts[row_hash] -= 1
+            removed_rows.append(row)
+
+    return {
+        'changed_rows': changed_rows,
+        'removed_rows': removed_rows
+    }
+
+
+def diff_documents(previous: Dict, current: Dict) -> Dict:
+    """두 버전의 파싱 결과를 시트 단위로 비교
+
+    행 위치만 바뀌고 내용이 같은 시트는 reordered_sheets로 따로 분류한다.
+    """
+    previous_sheets = previous['json_data']['sheets']
+    current_sheets = current['json_data']['sheets']
+
+    result = {
+        'unchanged_sheets': [],
+        'added_sheets': [],
+        'removed_sheets': [name for name in previous_sheets if name not in current_sheets],
+        'reordered_sheets': [],
+        'changed_sheets': {}
+    }
+
+    for sheet_name, sheet_content in current_sheets.items():
+        if sheet_name not in previous_sheets:
+            result['added_sheets'].append(sheet_name)
+            continue
+
+        previous_digest = previous['sheet_digests'][sheet_name]
+        current_digest = current['sheet_digests'][sheet_name]
+        if previous_digest['sheet_hash'] == current_digest['sheet_hash']:
+            result['unchanged_sheets'].append(sheet_name)
+            continue
+
+        sheet_diff = diff_sheet(
+            previous_sheets[sheet_name], previous_digest,
+            sheet_content, current_digest
+        )
+        if not sheet_diff['changed_rows'] and not sheet_diff['removed_rows']:
+            result['reordered_sheets'].append(sheet_name)
+            continue
+
+        # 변경 행만으로는 열 의미를 알 수 없으므로 시트의 헤더 행을 함께 전달
+        header_pos = detect_header_row(sheet_content)
+        sheet_diff['header_row'] = sheet_content[header_pos] if header_pos is not None else None
+        result['changed_sheets'][sheet_name] = sheet_diff
+
+    return result
+
+
+class WorkpaperVersionTracker:
+    def __init__(self):
+        """감사조서 버전 이력 초기화 (engagement, 파일명) 단위로 관리"""
+        self.versions: Dict[Tuple[str, str], List[Dict]] = {}
+
+    def get_latest(self, engagement: str, file_name: str) -> Optional[Dict]:
+        """가장 최근 버전 반환"""
+        history = self.versions.get((engagement, file_name))
+        return history[-1] if history else None
+
+    def has_content(self, engagement: str, file_name: str, content_hash: str) -> bool:
+        """동일한 내용의 파일이 이미 등록되었는지 확인"""
+        history = self.versions.get((engagement, file_name), [])
+        return any(version['content_hash'] == content_hash for version in history)
+
+    def register(self, engagement: str, file_name: str, content_hash: str, json_data: Dict) -> Dict:
+        """새 버전 등록 후 이전 버전과의 차이 계산
+
+        변경/삭제 행이 많은 시트는 등록 시점에 한 번만 통계 프로파일로 대체한다.
+        """
+        previous = self.get_latest(engagement, file_name)
+        current = {
+            'version': previous['version'] + 1 if previous else 1,
+            'content_hash': content_hash,
+            'json_data': json_data,
+            'sheet_digests': compute_document_digests(json_data),
+            'findings': None,
+            'uploaded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'diff': None
+        }
+
+        if previous:
+            current['diff'] = diff_documents(previous, current)
+            for sheet_diff in current['diff']['changed_sheets'].values():
+                for key in ('changed_rows', 'removed_rows'):
+                    sheet_diff[key] = compact_rows(sheet_diff[key], sheet_diff['header_row'])
+
+        # 이전 버전은 비교에 더 이상 쓰이지 않으므로 파싱 결과를 버리고 이력만 보관
+        history = self.versions.setdefault((engagement, file_name), [])
+        history[:] = [
+            {key: version[key] for key in ('version', 'content_hash', 'findings')}
+            for version in history
+        ]
+        history.append(current)
+        return current
+
+    def record_findings(self, engagement: str, file_name: str, findings: str) -> None:
+        """최신 버전에 대한 검토 의견 저장 (명시적 검토 결과만, 기존 의견 대체)"""
+        latest = self.get_latest(engagement, file_name)
+        if latest:
+            latest['findings'] = findings[:MAX_FINDING_CHARS]
+
+    def build_review_payload(self, engagement: str, file_name: str) -> Optional[Dict]:
+        """검토 요청 시 모델에 전달할 데이터 구성 (수정본은 변경 영역과 이전 검토 의견만 포함)"""
+        history = self.versions.get((engagement, file_name))
+        if not history:
+            return None
+
+        latest = history[-1]
+        if latest['diff'] is None:
+            return latest['json_data']
+
+        previous = history[-2]
+        diff = latest['diff']
+        json_data = latest['json_data']
+        # 이전 버전 중 검토 의견이 있는 가장 최근 버전의 의견만 전달
+        prior_findings = next(
+            (version['findings'] for version in reversed(history[:-1]) if version['findings']),
+            None
+        )
+        return {
+            'metadata': json_data['metadata'],
+            'revision': {
+                'version': latest['version'],
+                'previous_version': previous['version'],
+                'unchanged_sheets': diff['unchanged_sheets'],
+                'removed_sheets': diff['removed_sheets'],
+                'reordered_sheets': diff['reordered_sheets'],
+                'changed_sheets': diff['changed_sheets'],
+                'prior_findings': prior_findings
+            },
+            'sheets': {
+                sheet_name: json_data['sheets'][sheet_name]
+                for sheet_name in diff['added_sheets']
+            },
+            # 업로드 시 생성한 프로파일을 재사용하도록 함께 전달
+            'sheet_profiles': {
+                sheet_name: profile
+                for sheet_name, profile in json_data.get('sheet_profiles', {}).items()
+                if sheet_name in diff['added_sheets']
+            }
+        }